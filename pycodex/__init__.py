@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Optional
 
 from .cli_wrapper import CodexResult, CommandResult
 from .codex import CodexBackend
 from .gemini import GeminiBackend
 from .exceptions import CodexError, BackendNotFoundError, ExecutionError
+from .utils import clear_config_cache, cli_help, parse_code_and_text, which
 
 
 class PyCodex:
     def __init__(self, backend: str = 'codex', model: Optional[str] = None, approval_mode: str = 'suggest'):
+        # Bound memory held by the parse memo across long-lived facades.
+        parse_code_and_text.cache_clear()
         backend_lc = backend.lower()
         if backend_lc == 'codex':
             self.backend = CodexBackend(model=model or 'gpt-5-codex', approval_mode=approval_mode)
@@ -27,9 +31,38 @@ class PyCodex:
     def edit(self, code: str, instructions: str) -> CodexResult:
         return self.backend.edit(code, instructions)
 
+    async def agenerate(self, prompt: str, files: list[str] | None = None) -> CodexResult:
+        return await self.backend.agenerate(prompt, files)
+
+    async def aexplain(self, code: str) -> CodexResult:
+        return await self.backend.aexplain(code)
+
+    async def aedit(self, code: str, instructions: str) -> CodexResult:
+        return await self.backend.aedit(code, instructions)
+
+    async def abatch(self, prompts: list[str], max_in_flight: int = 4) -> list[CodexResult]:
+        """
+        Run several generate() prompts concurrently; total latency approaches
+        the slowest single call instead of the sum. max_in_flight bounds the
+        number of CLI subprocesses alive at once.
+        """
+        sem = asyncio.Semaphore(max_in_flight)
+
+        async def _one(p: str) -> CodexResult:
+            async with sem:
+                return await self.agenerate(p)
+
+        return list(await asyncio.gather(*[_one(p) for p in prompts]))
+
     def exec_command(self, command: str, safe: bool = True) -> CommandResult:
         return self.backend.exec_command(command, safe)
 
+    def reload_config(self) -> None:
+        """Drop cached lookups (PATH resolution, --help probes, parsed config) so environment changes are picked up; mainly for tests."""
+        which.cache_clear()
+        cli_help.cache_clear()
+        clear_config_cache()
+
     def interactive(self):
         print("PyCodex interactive session. Type 'exit' to quit.")
         while True:
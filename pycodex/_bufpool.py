@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import threading
+
+
+class BufPool:
+    """
+    Pool of fixed-size bytearray slabs for pipe reads.
+
+    Subprocess output used to accumulate in a growing buffer that
+    reallocates-and-copies geometrically; reading into recycled 64 KB slabs
+    and joining them once at EOF moves each byte exactly once and keeps the
+    hot path free of fresh allocations after warm-up.
+    """
+
+    def __init__(self, slab_size: int = 65536, cap: int = 64):
+        self.slab_size = slab_size
+        self.cap = cap
+        self._free: list[bytearray] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bytearray:
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+        return bytearray(self.slab_size)
+
+    def release(self, slab: bytearray) -> None:
+        with self._lock:
+            if len(self._free) < self.cap:
+                self._free.append(slab)
+
+
+# Shared pool for all subprocess pipe reads.
+POOL = BufPool()
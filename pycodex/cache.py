@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Iterable, Optional, Tuple
+
+from .cli_wrapper import CodexResult
+
+_DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.pycodex', 'cache')
+_DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+_DEFAULT_MAX_ROWS = 1024
+
+
+def cache_disabled() -> bool:
+    return os.getenv('PYCODEX_CACHE_DISABLE', '0') == '1'
+
+
+def make_key(**fields: Any) -> str:
+    """
+    Build a stable cache key from arbitrary request fields
+    (backend, model, approval_mode, sandbox, prompt, ...).
+    """
+    payload = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def digest_chunks(chunks: Iterable[Tuple[str, bytes]]) -> str:
+    """
+    Incrementally hash (path, bytes) context chunks so streamed requests can
+    be cache-keyed without concatenating the chunks into one string.
+    """
+    h = hashlib.sha256()
+    for name, data in chunks:
+        h.update(name.encode('utf-8'))
+        h.update(b'\0')
+        h.update(data)
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class LLMCache:
+    """
+    Exact-match response cache for backend CLI calls.
+
+    Rows are keyed on a sha256 over the full request (see make_key) and
+    stored in a SQLite file under ~/.pycodex/cache/. Entries expire after
+    `ttl` seconds and the oldest rows are evicted once `max_rows` is
+    exceeded. All failures are swallowed: a broken cache must never break
+    a backend call.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: int = _DEFAULT_TTL_SECONDS, max_rows: int = _DEFAULT_MAX_ROWS):
+        if path is None:
+            os.makedirs(_DEFAULT_DIR, exist_ok=True)
+            path = os.path.join(_DEFAULT_DIR, 'responses.sqlite3')
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " code TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " log TEXT NOT NULL,"
+            " ts REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[CodexResult]:
+        try:
+            row = self._conn.execute(
+                "SELECT code, text, log, ts FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        code, text, log, ts = row
+        if self.ttl and (time.time() - ts) > self.ttl:
+            try:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+            except sqlite3.Error:
+                pass
+            return None
+        return CodexResult(code=code, text=text, log=log)
+
+    def put(self, key: str, result: CodexResult) -> None:
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, code, text, log, ts) VALUES (?, ?, ?, ?, ?)",
+                (key, result.code, result.text, result.log, time.time()),
+            )
+            # LRU-style eviction: drop the oldest rows past the cap.
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY ts DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            )
+            self._conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        try:
+            self._conn.close()
+        except sqlite3.Error:
+            pass
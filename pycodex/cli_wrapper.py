@@ -4,13 +4,29 @@ from abc import ABC, abstractmethod
 
 
 class CodexResult:
-    def __init__(self, code: str = '', text: str = '', log: str = ''):
+    # One instance per backend call; slots cut the per-instance dict and
+    # make attribute access a fixed-offset load. The log line is joined
+    # lazily from the command tuple — most callers never read .log, so the
+    # per-call ' '.join allocation only happens on demand.
+    __slots__ = ("code", "text", "_cmd", "_file_log", "_log")
+
+    def __init__(self, code: str = '', text: str = '', cmd: tuple[str, ...] = (), file_log: str = '', log: str | None = None):
         self.code = code
         self.text = text
-        self.log = log
+        self._cmd = tuple(cmd)
+        self._file_log = file_log
+        self._log = log
+
+    @property
+    def log(self) -> str:
+        if self._log is not None:
+            return self._log
+        return f"cmd={' '.join(self._cmd)}\n{self._file_log}"
 
 
 class CommandResult:
+    __slots__ = ("output", "error", "status_code")
+
     def __init__(self, output: str, error: str, status_code: int):
         self.output = output
         self.error = error
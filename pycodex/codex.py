@@ -1,108 +1,343 @@
 from __future__ import annotations
 
 import os
+import re
+import tempfile
 from typing import Optional, List
 
+from .cache import LLMCache, cache_disabled, digest_chunks, make_key
 from .cli_wrapper import CodexInterface, CodexResult, CommandResult
 from .exceptions import BackendNotFoundError, ExecutionError
+from .prompts import SYSTEM_HEADER
+from .session import CliSession
 from .utils import (
+    MAX_PROMPT_CHARS,
+    arun_subprocess,
+    cli_help,
     exec_shell_command,
+    min_prompt_chars,
     parse_code_and_text,
     read_files,
+    read_files_chunks,
     run_subprocess,
+    run_subprocess_stream,
+    stream_subprocess,
     which,
     get_config,
 )
 
+# Matches 'repl' as a standalone word in a --help subcommand listing; a bare
+# substring test also matched prose like "replaced".
+_REPL_CMD_RE = re.compile(r'\brepl\b')
+
 
 class CodexBackend(CodexInterface):
     def __init__(self, model: Optional[str] = 'gpt-5-codex', approval_mode: str = 'suggest'):
         cfg = get_config()
         bc = (cfg.get('backend') or {}).get('codex') or {}
 
-        self.model = os.getenv('PYCODEX_CODEX_MODEL') or model or bc.get('model') or 'gpt-5-codex'
-        self.approval_mode = os.getenv('PYCODEX_APPROVAL', approval_mode or bc.get('approval_mode') or 'suggest')
-        self.base_cmd = os.getenv('PYCODEX_CODEX_CLI', bc.get('cli') or 'codex')
+        # One local binding for the environ proxy; repeated os.getenv calls
+        # each re-traverse (and on some platforms re-decode) the mapping.
+        env = os.environ
+        self.model = env.get('PYCODEX_CODEX_MODEL') or model or bc.get('model') or 'gpt-5-codex'
+        self.approval_mode = env.get('PYCODEX_APPROVAL') or approval_mode or bc.get('approval_mode') or 'suggest'
+        self.base_cmd = env.get('PYCODEX_CODEX_CLI') or bc.get('cli') or 'codex'
 
         # Optional behavior toggles
-        self.use_files_arg = _truthy(os.getenv('PYCODEX_CODEX_FILES_ARG', str(bc.get('files_arg', False))))
-        self.split_edit = _truthy(os.getenv('PYCODEX_CODEX_SPLIT_EDIT', str(bc.get('split_edit', True))))
-        if which(self.base_cmd) is None:
-            self._available = False
-        else:
-            self._available = True
-
-    def _ensure_available(self):
-        if not self._available and which(self.base_cmd) is None:
-            raise BackendNotFoundError(f"Codex CLI not found: '{self.base_cmd}'. Set PYCODEX_CODEX_CLI or install the CLI.")
+        self.use_files_arg = _truthy(env.get('PYCODEX_CODEX_FILES_ARG', str(bc.get('files_arg', False))))
+        self.split_edit = _truthy(env.get('PYCODEX_CODEX_SPLIT_EDIT', str(bc.get('split_edit', True))))
 
-    def _run_exec(self, prompt: str, files: list[str] | None = None) -> CodexResult:
-        import tempfile
-        import os as _os
+        # Resolved once here so the per-call path reads no env/config.
+        self.sandbox: Optional[str] = env.get('PYCODEX_CODEX_SANDBOX') or bc.get('sandbox')
+        self.stats = {'hits': 0, 'misses': 0}
+        self._cache: Optional[LLMCache] = None
+        self._cache_failed = False
+        self._session: Optional[CliSession] = None
+        self._session_failed = False
 
-        self._ensure_available()
-        context, file_log = read_files(files or [])
-        full_prompt = prompt
-        if context:
-            full_prompt = f"{prompt}\n\n[CONTEXT]\n{context}"
+        # Runtime specialization: resolve the CLI path and probe its --help
+        # once, then precompute the exec command prefix. The hot path extends
+        # a ready-made list instead of re-running env/config/flag logic.
+        self._cli_abspath = which(self.base_cmd)
+        self._help = cli_help(self._cli_abspath) if self._cli_abspath else ''
+        self._needs_last_msg_file = "--output-last-message" in self._help
+        template: List[str] = [self._cli_abspath or self.base_cmd, "exec"]
+        if self.model:
+            template += ["--model", self.model]
+        template += ["--color", "never", "--skip-git-repo-check"]
+        if self.sandbox:
+            template += ["--sandbox", str(self.sandbox)]
+        self._exec_cmd_template = template
 
-        tmpf = tempfile.NamedTemporaryFile(prefix="pycodex_last_msg_", suffix=".txt", delete=False)
-        tmp_path = tmpf.name
-        tmpf.close()
+    def _get_cache(self) -> Optional[LLMCache]:
+        if self._cache is None and not self._cache_failed:
+            try:
+                self._cache = LLMCache()
+            except Exception:
+                self._cache_failed = True
+        return self._cache
 
-        cmd: List[str] = [self.base_cmd, "exec"]
+    def _get_session(self) -> Optional[CliSession]:
+        """Return a live REPL session, or None if the CLI has no REPL mode."""
+        if self._session_failed:
+            return None
+        if self._session is not None and self._session.alive():
+            return self._session
+        if not _REPL_CMD_RE.search(self._help):
+            self._session_failed = True
+            return None
+        cmd: List[str] = [self._cli_abspath or self.base_cmd, "repl"]
         if self.model:
             cmd += ["--model", self.model]
         cmd += ["--color", "never", "--skip-git-repo-check"]
+        try:
+            self._session = CliSession(cmd)
+        except OSError:
+            self._session_failed = True
+            return None
+        return self._session
+
+    def _ensure_available(self):
+        if which(self.base_cmd) is None:
+            raise BackendNotFoundError(f"Codex CLI not found: '{self.base_cmd}'. Set PYCODEX_CODEX_CLI or install the CLI.")
+
+    def _cache_lookup(self, sandbox: Optional[str], full_prompt: str, context_sha: Optional[str] = None):
+        """
+        Exact-match response cache. Interactive ('suggest') runs may have
+        user-dependent outcomes, so only non-interactive modes are cached.
+        Returns (cache, cache_key, cached_result).
+        """
+        cache = None
+        cache_key = None
+        if not cache_disabled() and self.approval_mode != 'suggest':
+            cache = self._get_cache()
+        if cache is None:
+            return None, None, None
+        cache_key = make_key(
+            backend='codex', model=self.model, mode=self.approval_mode,
+            sandbox=sandbox, prompt=full_prompt, context_sha=context_sha,
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            self.stats['hits'] += 1
+        else:
+            self.stats['misses'] += 1
+        return cache, cache_key, cached
 
-        sandbox = _os.getenv("PYCODEX_CODEX_SANDBOX") or (get_config().get('backend') or {}).get('codex', {}).get('sandbox')
-        if sandbox:
-            cmd += ["--sandbox", str(sandbox)]
+    def _make_last_msg_file(self) -> Optional[str]:
+        """
+        Path for --output-last-message, or None when the CLI lacks the flag
+        and the last message can be parsed straight from stdout. Supported
+        CLIs get a tmpfs-backed file (/dev/shm) so the read is a RAM hit.
+        """
+        if not self._needs_last_msg_file:
+            return None
+        shm = "/dev/shm"
+        fd, path = tempfile.mkstemp(
+            prefix="pycodex_last_msg_", suffix=".txt",
+            dir=shm if os.path.isdir(shm) else None,
+        )
+        os.close(fd)
+        return path
 
-        cmd += ["--output-last-message", tmp_path]
+    def _exec_cmd(self, tmp_path: Optional[str]) -> List[str]:
+        if tmp_path is None:
+            return list(self._exec_cmd_template)
+        return [*self._exec_cmd_template, "--output-last-message", tmp_path]
 
-        status, out, err = run_subprocess(cmd, input_text=full_prompt)
+    @staticmethod
+    def _collect_last_msg(tmp_path: Optional[str], out: str) -> str:
+        if tmp_path is None:
+            return out
         try:
-            if _os.path.exists(tmp_path):
+            if os.path.exists(tmp_path):
                 with open(tmp_path, 'r', encoding='utf-8') as f:
-                    last_msg = f.read()
-            else:
-                last_msg = out
+                    return f.read()
+            return out
         finally:
             try:
-                _os.unlink(tmp_path)
+                os.unlink(tmp_path)
             except Exception:
                 pass
 
+    @staticmethod
+    def _gate_prompt(prompt: str) -> Optional[CodexResult]:
+        """
+        Execution-avoidance front gate: trivially empty prompts get an
+        immediate empty result and oversized ones are refused outright —
+        neither is worth a subprocess and a network round trip.
+        """
+        if len((prompt or '').strip()) < min_prompt_chars():
+            return CodexResult(code='', text='', log='no-op: empty prompt')
+        if len(prompt) > MAX_PROMPT_CHARS:
+            raise ExecutionError(f"Prompt too large ({len(prompt)} chars > {MAX_PROMPT_CHARS}); refusing to invoke the CLI.")
+        return None
+
+    def _finish_exec(self, cmd: List[str], last_msg: str, file_log: str, cache, cache_key) -> CodexResult:
+        code, text = parse_code_and_text(last_msg)
+        result = CodexResult(code=code, text=text, cmd=tuple(cmd), file_log=file_log)
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, result)
+        return result
+
+    def _run_exec(self, prompt: str, files: list[str] | None = None) -> CodexResult:
+        gated = self._gate_prompt(prompt)
+        if gated is not None:
+            return gated
+        self._ensure_available()
+        chunks, file_log = read_files_chunks(files or [])
+        sandbox = self.sandbox
+
+        if chunks:
+            # Stream the file chunks straight into the CLI instead of
+            # concatenating the whole context into one string; peak memory
+            # stays near one chunk instead of 2x the context. Static parts
+            # (system header, context) go first and the volatile prompt last
+            # so the CLI's prompt-prefix cache can hit across calls.
+            # (The REPL session takes a single string, so it is not used here.)
+            cache, cache_key, cached = self._cache_lookup(sandbox, prompt, context_sha=digest_chunks(chunks))
+            if cached is not None:
+                return cached
+            tmp_path = self._make_last_msg_file()
+            cmd = self._exec_cmd(tmp_path)
+            header = f"{SYSTEM_HEADER}\n\n[CONTEXT]\n".encode('utf-8')
+            trailer = f"\n\n{prompt}".encode('utf-8')
+            status, out, err = run_subprocess_stream(cmd, header=header, chunks=chunks, trailer=trailer)
+            last_msg = self._collect_last_msg(tmp_path, out)
+            if status != 0:
+                raise ExecutionError(f"Codex CLI failed ({status}): {err.strip() or out.strip()}")
+            return self._finish_exec(cmd, last_msg, file_log, cache, cache_key)
+
+        full_prompt = f"{SYSTEM_HEADER}\n\n{prompt}"
+
+        # Prefer a persistent REPL session when the CLI supports one; a dead
+        # or failed session falls back to the one-shot exec path below. The
+        # response cache is bypassed entirely here: session replies can
+        # depend on prior turns, so they are neither served from nor written
+        # to the stateless cache.
+        session = self._get_session()
+        if session is not None:
+            try:
+                last_msg = session.send(full_prompt)
+            except ExecutionError:
+                # A session that failed mid-turn may still be alive with a
+                # desynced pipe; tear it down so it is never handed out again.
+                self._session_failed = True
+                session.close()
+                self._session = None
+            else:
+                return self._finish_exec(session.cmd, last_msg, file_log, None, None)
+
+        cache, cache_key, cached = self._cache_lookup(sandbox, full_prompt)
+        if cached is not None:
+            return cached
+
+        tmp_path = self._make_last_msg_file()
+        cmd = self._exec_cmd(tmp_path)
+
+        # Scan stdout as it streams and extract the code block as soon as its
+        # closing fence arrives, overlapping the parse with the CLI's
+        # remaining generation instead of serializing it after the wait.
+        early: List[str] = []
+
+        def _on_fence(seen: bytes) -> None:
+            code, _ = parse_code_and_text(seen.decode('utf-8', 'replace'))
+            if code:
+                early.append(code)
+
+        status, out, err = stream_subprocess(cmd, input_text=full_prompt, fence_cb=_on_fence)
+        last_msg = self._collect_last_msg(tmp_path, out)
         if status != 0:
             raise ExecutionError(f"Codex CLI failed ({status}): {err.strip() or out.strip()}")
-
         code, text = parse_code_and_text(last_msg)
-        return CodexResult(code=code, text=text, log=f"cmd={' '.join(cmd)}\n{file_log}")
+        if tmp_path is None and not code and early:
+            # Only when stdout *is* the message (no --output-last-message
+            # file) may the fence fallback apply — a fenced block in the
+            # transcript is just progress noise otherwise. Applied before
+            # caching so the cached row matches the returned result.
+            code = early[0]
+        result = CodexResult(code=code, text=text, cmd=tuple(cmd), file_log=file_log)
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, result)
+        return result
 
-    def generate(self, prompt: str, files: list[str] | None = None) -> CodexResult:
-        return self._run_exec(prompt, files)
+    async def _arun_exec(self, prompt: str, files: list[str] | None = None) -> CodexResult:
+        """
+        Async mirror of _run_exec. Always uses the one-shot exec path — the
+        REPL session is a single blocking pipe and cannot be multiplexed.
+        """
+        gated = self._gate_prompt(prompt)
+        if gated is not None:
+            return gated
+        self._ensure_available()
+        context, file_log = read_files(files or [])
+        # Static parts first, volatile prompt last (see _run_exec).
+        if context:
+            full_prompt = f"{SYSTEM_HEADER}\n\n[CONTEXT]\n{context}\n\n{prompt}"
+        else:
+            full_prompt = f"{SYSTEM_HEADER}\n\n{prompt}"
 
-    def explain(self, code: str) -> CodexResult:
-        prompt = (
+        sandbox = self.sandbox
+        cache, cache_key, cached = self._cache_lookup(sandbox, full_prompt)
+        if cached is not None:
+            return cached
+
+        tmp_path = self._make_last_msg_file()
+        cmd = self._exec_cmd(tmp_path)
+        status, out, err = await arun_subprocess(cmd, input_text=full_prompt)
+        last_msg = self._collect_last_msg(tmp_path, out)
+        if status != 0:
+            raise ExecutionError(f"Codex CLI failed ({status}): {err.strip() or out.strip()}")
+        return self._finish_exec(cmd, last_msg, file_log, cache, cache_key)
+
+    @staticmethod
+    def _explain_prompt(code: str) -> str:
+        return (
             "Explain the following code in clear terms. Include purpose, key logic, and potential issues.\n\n"
             "```\n" + code + "\n```\n"
         )
-        return self._run_exec(prompt)
 
-    def edit(self, code: str, instructions: str) -> CodexResult:
-        prompt = (
+    @staticmethod
+    def _gate_code(code: str) -> Optional[CodexResult]:
+        if not (code and code.strip()):
+            return CodexResult(code='', text='<empty input>', log='no-op: empty code')
+        return None
+
+    @staticmethod
+    def _edit_prompt(code: str, instructions: str) -> str:
+        # Code (the stable part across successive edits) precedes the
+        # volatile instructions so repeated edits share a cacheable prefix.
+        return (
             "Edit the code per the instructions. Respond with the full, updated code in a fenced block.\n\n"
-            "[INSTRUCTIONS]\n" + instructions + "\n\n[CODE]\n```\n" + code + "\n```\n"
+            "[CODE]\n```\n" + code + "\n```\n\n[INSTRUCTIONS]\n" + instructions + "\n"
         )
-        return self._run_exec(prompt)
+
+    def generate(self, prompt: str, files: list[str] | None = None) -> CodexResult:
+        return self._run_exec(prompt, files)
+
+    def explain(self, code: str) -> CodexResult:
+        return self._gate_code(code) or self._run_exec(self._explain_prompt(code))
+
+    def edit(self, code: str, instructions: str) -> CodexResult:
+        return self._gate_code(code) or self._run_exec(self._edit_prompt(code, instructions))
+
+    async def agenerate(self, prompt: str, files: list[str] | None = None) -> CodexResult:
+        return await self._arun_exec(prompt, files)
+
+    async def aexplain(self, code: str) -> CodexResult:
+        return self._gate_code(code) or await self._arun_exec(self._explain_prompt(code))
+
+    async def aedit(self, code: str, instructions: str) -> CodexResult:
+        return self._gate_code(code) or await self._arun_exec(self._edit_prompt(code, instructions))
 
     def exec_command(self, command: str, safe: bool = True) -> CommandResult:
         status, out, err = exec_shell_command(command, safe=safe, approval_mode=self.approval_mode)
         return CommandResult(output=out, error=err, status_code=status)
 
 
+# Built once; the literal set used to be rebuilt on every _truthy call.
+_TRUTHY = frozenset({"1", "true", "yes", "on"})
+
+
 def _truthy(val: Optional[str]) -> bool:
-    if val is None:
-        return False
-    return str(val).strip().lower() in {"1", "true", "yes", "on"}
+    return val is not None and str(val).strip().lower() in _TRUTHY
@@ -1,57 +1,233 @@
 from __future__ import annotations
 
 import os
+import re
 from typing import Optional
 
+from .cache import LLMCache, cache_disabled, digest_chunks, make_key
 from .cli_wrapper import CodexInterface, CodexResult, CommandResult
 from .exceptions import BackendNotFoundError, ExecutionError
+from .prompts import SYSTEM_HEADER
+from .session import CliSession
 from .utils import (
+    MAX_PROMPT_CHARS,
+    arun_subprocess,
     build_cli_command,
+    cli_help,
     exec_shell_command,
+    min_prompt_chars,
     parse_code_and_text,
     read_files,
+    read_files_chunks,
     run_subprocess,
+    run_subprocess_stream,
     which,
 )
 
+# Matches 'chat' as a standalone word in a --help subcommand listing; a bare
+# substring test also matched prose mentioning chatting.
+_CHAT_CMD_RE = re.compile(r'\bchat\b')
+
 
 class GeminiBackend(CodexInterface):
     def __init__(self, model: Optional[str] = 'gemini-1', approval_mode: str = 'suggest'):
         self.model = model
         self.approval_mode = approval_mode
-        self.base_cmd = os.getenv('PYCODEX_GEMINI_CLI', 'gemini')
-        if which(self.base_cmd) is None:
-            self._available = False
-        else:
-            self._available = True
+        self.base_cmd = os.environ.get('PYCODEX_GEMINI_CLI') or 'gemini'
+        self.stats = {'hits': 0, 'misses': 0}
+        self._cache: Optional[LLMCache] = None
+        self._cache_failed = False
+        self._session: Optional[CliSession] = None
+        self._session_failed = False
+        self._help: Optional[str] = None
+
+    def _get_cache(self) -> Optional[LLMCache]:
+        if self._cache is None and not self._cache_failed:
+            try:
+                self._cache = LLMCache()
+            except Exception:
+                self._cache_failed = True
+        return self._cache
+
+    def _cli_help(self) -> str:
+        if self._help is None:
+            exe = which(self.base_cmd)
+            self._help = cli_help(exe) if exe else ''
+        return self._help
+
+    def _get_session(self) -> Optional[CliSession]:
+        """Return a live chat session, or None if the CLI has no chat mode."""
+        if self._session_failed:
+            return None
+        if self._session is not None and self._session.alive():
+            return self._session
+        if not _CHAT_CMD_RE.search(self._cli_help()):
+            self._session_failed = True
+            return None
+        cmd = build_cli_command(self.base_cmd, 'chat', self.model, self.approval_mode)
+        try:
+            self._session = CliSession(cmd)
+        except OSError:
+            self._session_failed = True
+            return None
+        return self._session
 
     def _ensure_available(self):
-        if not self._available and which(self.base_cmd) is None:
+        if which(self.base_cmd) is None:
             raise BackendNotFoundError(f"Gemini CLI not found: '{self.base_cmd}'. Set PYCODEX_GEMINI_CLI or install the CLI.")
 
+    def _cache_lookup(self, subcommand: str, full_input: str, context_sha: Optional[str] = None):
+        """
+        Same caching policy as CodexBackend: skip interactive 'suggest' mode.
+        Returns (cache, cache_key, cached_result).
+        """
+        cache = None
+        cache_key = None
+        if not cache_disabled() and self.approval_mode != 'suggest':
+            cache = self._get_cache()
+        if cache is None:
+            return None, None, None
+        cache_key = make_key(
+            backend='gemini', model=self.model, mode=self.approval_mode,
+            subcommand=subcommand, prompt=full_input, context_sha=context_sha,
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            self.stats['hits'] += 1
+        else:
+            self.stats['misses'] += 1
+        return cache, cache_key, cached
+
+    @staticmethod
+    def _gate_payload(payload: str) -> Optional[CodexResult]:
+        """
+        Execution-avoidance front gate, mirroring CodexBackend: empty payloads
+        get an immediate empty result, oversized ones are refused outright.
+        """
+        if len((payload or '').strip()) < min_prompt_chars():
+            return CodexResult(code='', text='', log='no-op: empty prompt')
+        if len(payload) > MAX_PROMPT_CHARS:
+            raise ExecutionError(f"Prompt too large ({len(payload)} chars > {MAX_PROMPT_CHARS}); refusing to invoke the CLI.")
+        return None
+
+    @staticmethod
+    def _gate_code(code: str) -> Optional[CodexResult]:
+        if not (code and code.strip()):
+            return CodexResult(code='', text='<empty input>', log='no-op: empty code')
+        return None
+
+    def _finish_invoke(self, cmd: list[str], out: str, file_log: str, cache, cache_key) -> CodexResult:
+        code, text = parse_code_and_text(out)
+        result = CodexResult(code=code, text=text, cmd=tuple(cmd), file_log=file_log)
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, result)
+        return result
+
     def _invoke(self, subcommand: str, payload: str, files: list[str] | None = None) -> CodexResult:
+        gated = self._gate_payload(payload)
+        if gated is not None:
+            return gated
+        self._ensure_available()
+        chunks, file_log = read_files_chunks(files or [])
+
+        if chunks:
+            # Stream the file chunks into the CLI rather than concatenating
+            # the full context into a single string. Static parts (system
+            # header, context) go first and the volatile payload last so the
+            # CLI's prompt-prefix cache can hit across calls.
+            # (The chat session takes a single string, so it is not used here.)
+            cache, cache_key, cached = self._cache_lookup(subcommand, payload, context_sha=digest_chunks(chunks))
+            if cached is not None:
+                return cached
+            cmd = build_cli_command(self.base_cmd, subcommand, self.model, self.approval_mode)
+            header = f"{SYSTEM_HEADER}\n\n[CONTEXT]\n".encode('utf-8')
+            trailer = f"\n\n{payload}".encode('utf-8')
+            status, out, err = run_subprocess_stream(cmd, header=header, chunks=chunks, trailer=trailer)
+            if status != 0:
+                raise ExecutionError(f"Gemini CLI failed ({status}): {err.strip() or out.strip()}")
+            return self._finish_invoke(cmd, out, file_log, cache, cache_key)
+
+        full_input = f"{SYSTEM_HEADER}\n\n{payload}"
+
+        # Prefer a persistent chat session when the CLI supports one; a dead
+        # or failed session falls back to the one-shot path below. The
+        # response cache is bypassed entirely here: session replies can
+        # depend on prior turns, so they are neither served from nor written
+        # to the stateless cache.
+        session = self._get_session()
+        if session is not None:
+            try:
+                out = session.send(f"[{subcommand.upper()}]\n{full_input}")
+            except ExecutionError:
+                # A session that failed mid-turn may still be alive with a
+                # desynced pipe; tear it down so it is never handed out again.
+                self._session_failed = True
+                session.close()
+                self._session = None
+            else:
+                return self._finish_invoke(session.cmd, out, file_log, None, None)
+
+        cache, cache_key, cached = self._cache_lookup(subcommand, full_input)
+        if cached is not None:
+            return cached
+
+        cmd = build_cli_command(self.base_cmd, subcommand, self.model, self.approval_mode)
+        status, out, err = run_subprocess(cmd, input_text=full_input)
+        if status != 0:
+            raise ExecutionError(f"Gemini CLI failed ({status}): {err.strip() or out.strip()}")
+        return self._finish_invoke(cmd, out, file_log, cache, cache_key)
+
+    async def _ainvoke(self, subcommand: str, payload: str, files: list[str] | None = None) -> CodexResult:
+        """
+        Async mirror of _invoke. Always uses the one-shot path — the chat
+        session is a single blocking pipe and cannot be multiplexed.
+        """
+        gated = self._gate_payload(payload)
+        if gated is not None:
+            return gated
         self._ensure_available()
         context, file_log = read_files(files or [])
-        full_input = payload
+        # Static parts first, volatile payload last (see _invoke).
         if context:
-            full_input = f"{payload}\n\n[CONTEXT]\n{context}"
+            full_input = f"{SYSTEM_HEADER}\n\n[CONTEXT]\n{context}\n\n{payload}"
+        else:
+            full_input = f"{SYSTEM_HEADER}\n\n{payload}"
+        cache, cache_key, cached = self._cache_lookup(subcommand, full_input)
+        if cached is not None:
+            return cached
+
         cmd = build_cli_command(self.base_cmd, subcommand, self.model, self.approval_mode)
-        status, out, err = run_subprocess(cmd, input_text=full_input)
+        status, out, err = await arun_subprocess(cmd, input_text=full_input)
         if status != 0:
             raise ExecutionError(f"Gemini CLI failed ({status}): {err.strip() or out.strip()}")
-        code, text = parse_code_and_text(out)
-        return CodexResult(code=code, text=text, log=f"cmd={' '.join(cmd)}\n{file_log}")
+        return self._finish_invoke(cmd, out, file_log, cache, cache_key)
 
     def generate(self, prompt: str, files: list[str] | None = None) -> CodexResult:
         return self._invoke('generate', prompt, files)
 
     def explain(self, code: str) -> CodexResult:
-        return self._invoke('explain', code)
+        return self._gate_code(code) or self._invoke('explain', code)
 
     def edit(self, code: str, instructions: str) -> CodexResult:
-        payload = f"[INSTRUCTIONS]\n{instructions}\n\n[CODE]\n{code}"
+        gated = self._gate_code(code)
+        if gated is not None:
+            return gated
+        payload = f"[CODE]\n{code}\n\n[INSTRUCTIONS]\n{instructions}"
         return self._invoke('edit', payload)
 
+    async def agenerate(self, prompt: str, files: list[str] | None = None) -> CodexResult:
+        return await self._ainvoke('generate', prompt, files)
+
+    async def aexplain(self, code: str) -> CodexResult:
+        return self._gate_code(code) or await self._ainvoke('explain', code)
+
+    async def aedit(self, code: str, instructions: str) -> CodexResult:
+        gated = self._gate_code(code)
+        if gated is not None:
+            return gated
+        payload = f"[CODE]\n{code}\n\n[INSTRUCTIONS]\n{instructions}"
+        return await self._ainvoke('edit', payload)
+
     def exec_command(self, command: str, safe: bool = True) -> CommandResult:
         status, out, err = exec_shell_command(command, safe=safe, approval_mode=self.approval_mode)
         return CommandResult(output=out, error=err, status_code=status)
@@ -1,3 +1,12 @@
+# Constant header prepended verbatim to every backend turn. Keeping this
+# byte-identical across calls gives the CLI's prompt-prefix cache a shared
+# prefix to hit on; do not interpolate anything into it.
+SYSTEM_HEADER = (
+    "You are a coding assistant invoked through pycodex. Context files, when "
+    "present, appear first under [CONTEXT]; the task follows at the end. "
+    "Return code in fenced code blocks."
+)
+
 UNIT_TEST_GENERATOR = (
     "You are a test generator. Given the module code and context, "
     "produce comprehensive unit tests with edge cases. Use pytest style."
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import atexit
+import collections
+import os
+import select
+import subprocess
+import threading
+import time
+from typing import Optional
+
+from .exceptions import ExecutionError
+
+# End-of-message sentinel echoed back by the CLI after each turn.
+SENTINEL = "<<<PYCODEX_EOM>>>"
+
+
+class CliSession:
+    """
+    A long-lived CLI process multiplexing prompts over stdin/stdout.
+
+    The process is started once (e.g. `codex repl` / `gemini chat`) and each
+    prompt is written followed by a sentinel line; the response is everything
+    read back until the sentinel reappears. This amortizes one CLI startup
+    across many calls and lets the CLI's own prompt cache hit across turns.
+
+    Every read is bounded: the first turn by `first_reply_timeout` (a CLI
+    that runs the subcommand but never speaks the protocol fails fast) and
+    later turns by `read_timeout`. On expiry or EOF the process is killed
+    and send() raises ExecutionError, so callers fall back to their one-shot
+    path instead of hanging. stderr is drained in a background thread — a
+    chatty child cannot block mid-turn on a full pipe — and its tail is
+    included in the error message.
+    """
+
+    def __init__(self, cmd: list[str], read_timeout: float = 120.0, first_reply_timeout: float = 15.0):
+        self.cmd = list(cmd)
+        self.read_timeout = read_timeout
+        self.first_reply_timeout = first_reply_timeout
+        self._replied = False
+        self._proc = subprocess.Popen(
+            self.cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        # Bounded: keep only the most recent chunks for diagnostics.
+        self._stderr_chunks: collections.deque[bytes] = collections.deque(maxlen=16)
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+        atexit.register(self.close)
+
+    def _drain_stderr(self) -> None:
+        fd = self._proc.stderr.fileno()
+        while True:
+            try:
+                chunk = os.read(fd, 4096)
+            except OSError:
+                return
+            if not chunk:
+                return
+            self._stderr_chunks.append(chunk)
+
+    def _stderr_tail(self) -> str:
+        return b''.join(self._stderr_chunks).decode('utf-8', 'replace').strip()
+
+    def alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def _fail(self, msg: str) -> None:
+        try:
+            self._proc.kill()
+        except Exception:
+            pass
+        tail = self._stderr_tail()
+        if tail:
+            msg = f"{msg}; stderr: {tail}"
+        raise ExecutionError(msg)
+
+    def send(self, prompt: str, timeout: Optional[float] = None) -> str:
+        if not self.alive():
+            raise ExecutionError(f"CLI session exited ({self._proc.returncode}): {' '.join(self.cmd)}")
+        try:
+            self._proc.stdin.write((prompt + "\n" + SENTINEL + "\n").encode('utf-8'))
+            self._proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise ExecutionError(f"CLI session pipe closed: {e}")
+
+        if timeout is None:
+            timeout = self.read_timeout if self._replied else self.first_reply_timeout
+        sent = SENTINEL.encode('utf-8')
+        fd = self._proc.stdout.fileno()
+        buf = bytearray()
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._fail("CLI session timed out waiting for the response sentinel")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                self._fail("CLI session timed out waiting for the response sentinel")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                self._fail("CLI session closed before the response sentinel was seen")
+            buf.extend(chunk)
+            # Look for a complete line consisting of just the sentinel.
+            pos = buf.find(sent)
+            while pos != -1:
+                line_start = buf.rfind(b"\n", 0, pos) + 1
+                line_end = buf.find(b"\n", pos)
+                if line_end == -1:
+                    break
+                if bytes(buf[line_start:line_end]).strip() == sent:
+                    self._replied = True
+                    return bytes(buf[:line_start]).decode('utf-8', 'replace')
+                pos = buf.find(sent, pos + 1)
+
+    def close(self) -> None:
+        if self._proc.poll() is not None:
+            return
+        try:
+            if self._proc.stdin:
+                self._proc.stdin.close()
+            self._proc.wait(timeout=2)
+        except Exception:
+            try:
+                self._proc.kill()
+            except Exception:
+                pass
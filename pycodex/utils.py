@@ -1,10 +1,22 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import os
+import pickle
+import re
+import select
+import selectors
 import shlex
+import shutil
 import subprocess
-from typing import Iterable, Tuple, Any, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Tuple, Any, Dict
 
+from . import _uring
+from ._bufpool import POOL as _BUF_POOL
 from .exceptions import ExecutionError
 
 
@@ -13,23 +25,99 @@ def read_text(path: str) -> str:
         return f.read()
 
 
+_READ_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def _get_read_pool() -> ThreadPoolExecutor:
+    global _READ_POOL
+    if _READ_POOL is None:
+        _READ_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix='pycodex-read')
+    return _READ_POOL
+
+
+def _read_one(path: str) -> Tuple[str, Optional[bytes], Optional[str]]:
+    """
+    Read one file with a buffer presized from fstat so the whole file comes
+    back in (usually) a single readv call. Returns (path, raw_bytes, error).
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            n = os.fstat(fd).st_size
+            buf = bytearray(n)
+            mv = memoryview(buf)
+            off = 0
+            while off < n:
+                r = os.readv(fd, [mv[off:]])
+                if r == 0:
+                    break
+                off += r
+            return (path, bytes(buf[:off]), None)
+        finally:
+            os.close(fd)
+    except FileNotFoundError:
+        return (path, None, f"File not found: {path}")
+    except Exception as e:
+        return (path, None, f"Error reading {path}: {e}")
+
+
+def read_files_chunks(paths: Iterable[str]) -> Tuple[list[Tuple[str, bytes]], str]:
+    """
+    Returns ([(path, raw_bytes), ...], log) with input order preserved.
+    Keeping files as separate byte chunks lets callers stream them to a
+    subprocess without ever concatenating the whole context in memory.
+    Multiple files are read concurrently so total latency approaches the
+    slowest read instead of the sum.
+    """
+    paths = list(paths)
+    if not paths:
+        return ([], '')
+    results = None
+    if len(paths) == 1:
+        results = [_read_one(paths[0])]
+    elif _uring.available():
+        # One submit + one wait for the whole batch instead of 3 syscalls
+        # per file; any failure falls through to the thread pool.
+        try:
+            results = [(p, data, None) for p, data in _uring.read_all(paths)]
+        except Exception:
+            results = None
+    if results is None:
+        results = list(_get_read_pool().map(_read_one, paths))
+    chunks: list[Tuple[str, bytes]] = []
+    log_parts: list[str] = []
+    for p, data, error in results:
+        if error is not None:
+            log_parts.append(error)
+        else:
+            chunks.append((p, data))
+            log_parts.append(f"Included file: {p} ({len(data)} bytes)")
+    return (chunks, "\n".join(log_parts))
+
+
 def read_files(paths: Iterable[str]) -> Tuple[str, str]:
     """
     Returns a tuple of (combined_prompt_context, log).
     Each file is separated with a header marker for clarity to downstream CLIs.
     """
-    combined: list[str] = []
-    log_parts: list[str] = []
-    for p in paths:
-        try:
-            content = read_text(p)
-            combined.append(f"\n===== FILE: {p} =====\n{content}\n")
-            log_parts.append(f"Included file: {p} ({len(content)} chars)")
-        except FileNotFoundError:
-            log_parts.append(f"File not found: {p}")
-        except Exception as e:
-            log_parts.append(f"Error reading {p}: {e}")
-    return ("".join(combined), "\n".join(log_parts))
+    chunks, log = read_files_chunks(paths)
+    combined = [
+        f"\n===== FILE: {p} =====\n{data.decode('utf-8', 'replace')}\n"
+        for p, data in chunks
+    ]
+    return ("".join(combined), log)
+
+
+# Hard ceiling on prompt size passed to a CLI; anything larger risks OOMing
+# the child and is almost certainly a caller bug.
+MAX_PROMPT_CHARS = 2_000_000
+
+
+def min_prompt_chars() -> int:
+    try:
+        return int(os.getenv('PYCODEX_MIN_PROMPT_CHARS', '1'))
+    except ValueError:
+        return 1
 
 
 def is_noninteractive() -> bool:
@@ -46,21 +134,293 @@ def approve_action(prompt: str) -> bool:
     return ans in {"y", "yes"}
 
 
+def _communicate_pooled(proc: subprocess.Popen, input_bytes: bytes | None, timeout: int | None) -> Tuple[bytes, bytes, bool]:
+    """
+    communicate() replacement that reads stdout/stderr into recycled slabs
+    from the shared BufPool via os.readv, assembling each stream with one
+    join at EOF instead of growing-and-copying a buffer as output arrives.
+    Returns (out_bytes, err_bytes, timed_out).
+    """
+    sel = selectors.DefaultSelector()
+    parts: dict[int, list[Tuple[bytearray, int]]] = {}
+    for pipe in (proc.stdout, proc.stderr):
+        parts[pipe.fileno()] = []
+        sel.register(pipe.fileno(), selectors.EVENT_READ)
+
+    stdin_fd = None
+    in_view = None
+    if input_bytes is not None and proc.stdin is not None:
+        stdin_fd = proc.stdin.fileno()
+        os.set_blocking(stdin_fd, False)
+        in_view = memoryview(input_bytes)
+        sel.register(stdin_fd, selectors.EVENT_WRITE)
+    elif proc.stdin is not None:
+        proc.stdin.close()
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    timed_out = False
+    read_fds = set(parts)
+    while read_fds:
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+        events = sel.select(remaining)
+        if not events:
+            timed_out = True
+            break
+        for key, _ in events:
+            fd = key.fileobj
+            if fd == stdin_fd:
+                try:
+                    n = os.write(stdin_fd, in_view[:65536])
+                    in_view = in_view[n:]
+                except (BrokenPipeError, OSError):
+                    in_view = in_view[:0]
+                if len(in_view) == 0:
+                    sel.unregister(stdin_fd)
+                    try:
+                        proc.stdin.close()
+                    except Exception:
+                        pass
+                    stdin_fd = None
+                continue
+            slab = _BUF_POOL.acquire()
+            n = os.readv(fd, [slab])
+            if n == 0:
+                _BUF_POOL.release(slab)
+                sel.unregister(fd)
+                read_fds.discard(fd)
+            else:
+                parts[fd].append((slab, n))
+    sel.close()
+
+    def _assemble(pipe) -> bytes:
+        chunks = parts[pipe.fileno()]
+        data = b''.join(bytes(memoryview(slab)[:n]) for slab, n in chunks)
+        for slab, _ in chunks:
+            _BUF_POOL.release(slab)
+        return data
+
+    out_b = _assemble(proc.stdout)
+    err_b = _assemble(proc.stderr)
+    proc.stdout.close()
+    proc.stderr.close()
+    if proc.stdin is not None and stdin_fd is not None:
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+    return out_b, err_b, timed_out
+
+
 def run_subprocess(cmd: list[str], *, input_text: str | None = None, timeout: int | None = None) -> Tuple[int, str, str]:
+    # CPython's Popen only takes the posix_spawn (vfork-based) fast path when
+    # the executable is already a resolved path and no preexec_fn/cwd/uid
+    # tweaks are requested; a bare command name forces fork+exec per PATH
+    # candidate. Resolve via the cached which() so spawning skips the COW
+    # page-table copy of fork for large parent processes.
+    exe = which(cmd[0])
+    if exe is not None:
+        cmd = [exe, *cmd[1:]]
+    # Raw byte pipes: TextIOWrapper would decode incrementally as chunks
+    # arrive; decoding the fully-buffered output once is a single C-level
+    # pass and skips universal-newline translation on the way in.
     proc = subprocess.Popen(
         cmd,
         stdin=subprocess.PIPE if input_text is not None else None,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
     )
+    input_bytes = input_text.encode('utf-8') if input_text is not None else None
+    out_b, err_b, timed_out = _communicate_pooled(proc, input_bytes, timeout)
+    if timed_out:
+        proc.kill()
+        proc.wait()
+        return (124, out_b.decode('utf-8', 'replace'), err_b.decode('utf-8', 'replace') or 'Timeout expired')
+    proc.wait()
+    return (proc.returncode, out_b.decode('utf-8', 'replace'), err_b.decode('utf-8', 'replace'))
+
+
+def run_subprocess_stream(cmd: list[str], *, header: bytes = b'', chunks: Iterable[Tuple[str, bytes]] = (), trailer: bytes = b'', timeout: int | None = None) -> Tuple[int, str, str]:
+    """
+    Like run_subprocess, but pipes the prompt header and file chunks into
+    stdin one piece at a time instead of concatenating them into a single
+    string first. Peak memory stays at roughly one chunk plus the pipe
+    buffer rather than 2x the whole context.
+    """
+    exe = which(cmd[0])
+    if exe is not None:
+        cmd = [exe, *cmd[1:]]
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    # Drain stdout/stderr concurrently so a chatty child cannot deadlock
+    # against our stdin writes.
+    sinks: dict[str, bytes] = {}
+
+    def _drain(pipe, key: str) -> None:
+        sinks[key] = pipe.read()
+
+    t_out = threading.Thread(target=_drain, args=(proc.stdout, 'out'), daemon=True)
+    t_err = threading.Thread(target=_drain, args=(proc.stderr, 'err'), daemon=True)
+    t_out.start()
+    t_err.start()
+
+    try:
+        proc.stdin.write(header)
+        for name, data in chunks:
+            proc.stdin.write(f"\n===== FILE: {name} =====\n".encode('utf-8'))
+            proc.stdin.write(data)
+            proc.stdin.write(b"\n")
+        proc.stdin.write(trailer)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+
+    timed_out = False
     try:
-        out, err = proc.communicate(input=input_text, timeout=timeout)
+        proc.wait(timeout=timeout)
     except subprocess.TimeoutExpired:
         proc.kill()
-        out, err = proc.communicate()
-        return (124, out or '', err or 'Timeout expired')
-    return (proc.returncode, out or '', err or '')
+        proc.wait()
+        timed_out = True
+    t_out.join()
+    t_err.join()
+    out = sinks.get('out', b'').decode('utf-8', 'replace')
+    err = sinks.get('err', b'').decode('utf-8', 'replace')
+    if timed_out:
+        return (124, out, err or 'Timeout expired')
+    return (proc.returncode, out, err)
+
+
+def stream_subprocess(cmd: list[str], *, input_text: str | None = None, fence_cb=None, timeout: int | None = None) -> Tuple[int, str, str]:
+    """
+    Like run_subprocess, but reads stdout incrementally. When fence_cb is
+    given it is invoked once — with the bytes seen so far — as soon as two
+    ``` fences have appeared, so the caller can start extracting the code
+    block while the child is still streaming trailing text.
+    """
+    exe = which(cmd[0])
+    if exe is not None:
+        cmd = [exe, *cmd[1:]]
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if input_text is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=0,
+    )
+
+    sinks: dict[str, bytes] = {}
+
+    def _drain(pipe, key: str) -> None:
+        sinks[key] = pipe.read()
+
+    t_err = threading.Thread(target=_drain, args=(proc.stderr, 'err'), daemon=True)
+    t_err.start()
+
+    t_in = None
+    if input_text is not None:
+        def _feed() -> None:
+            try:
+                proc.stdin.write(input_text.encode('utf-8'))
+            except (BrokenPipeError, OSError):
+                pass
+            finally:
+                try:
+                    proc.stdin.close()
+                except Exception:
+                    pass
+
+        t_in = threading.Thread(target=_feed, daemon=True)
+        t_in.start()
+
+    fd = proc.stdout.fileno()
+    buf = bytearray()
+    fired = False
+    fences = 0
+    scanned = 0  # bytes of buf already counted for fences
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    timed_out = False
+    while True:
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            timed_out = True
+            break
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            break
+        buf.extend(chunk)
+        if fence_cb is not None and not fired:
+            # Count only the new bytes (rescanning the whole buffer per chunk
+            # is O(N^2) on fence-less output). Back up 2 bytes so a fence
+            # split across the chunk boundary is still seen; a full fence
+            # cannot fit in the overlap, so nothing is double-counted.
+            fences += buf.count(b"```", max(scanned - 2, 0))
+            scanned = len(buf)
+            if fences >= 2:
+                fired = True
+                try:
+                    fence_cb(bytes(buf))
+                except Exception:
+                    pass
+
+    if timed_out:
+        proc.kill()
+    proc.wait()
+    t_err.join()
+    if t_in is not None:
+        t_in.join()
+    out = bytes(buf).decode('utf-8', 'replace')
+    err = sinks.get('err', b'').decode('utf-8', 'replace')
+    if timed_out:
+        return (124, out, err or 'Timeout expired')
+    return (proc.returncode, out, err)
+
+
+async def arun_subprocess(cmd: list[str], *, input_text: str | None = None, timeout: int | None = None) -> Tuple[int, str, str]:
+    """
+    Async counterpart of run_subprocess; lets callers overlap several CLI
+    invocations instead of serializing on Popen.communicate.
+    """
+    # Same executable resolution as run_subprocess: keeps the underlying
+    # Popen on the posix_spawn fast path and skips the child-side PATH scan.
+    exe = which(cmd[0])
+    if exe is not None:
+        cmd = [exe, *cmd[1:]]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if input_text is not None else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        out, err = await asyncio.wait_for(
+            proc.communicate(input=input_text.encode('utf-8') if input_text is not None else None),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        proc.kill()
+        out, err = await proc.communicate()
+        return (124, (out or b'').decode('utf-8', 'replace'), (err or b'').decode('utf-8', 'replace') or 'Timeout expired')
+    return (proc.returncode or 0, (out or b'').decode('utf-8', 'replace'), (err or b'').decode('utf-8', 'replace'))
 
 
 def exec_shell_command(command: str, *, safe: bool = True, approval_mode: str = 'suggest') -> Tuple[int, str, str]:
@@ -93,12 +453,29 @@ def exec_shell_command(command: str, *, safe: bool = True, approval_mode: str =
     return (125, '', 'Command not approved by user')
 
 
+@functools.lru_cache(maxsize=128)
 def which(cmd: str) -> str | None:
-    for path in os.getenv('PATH', '').split(os.pathsep):
-        candidate = os.path.join(path, cmd)
-        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
-            return candidate
-    return None
+    """
+    Cached shutil.which. Resolving the same CLI repeatedly (backend
+    construction, availability checks) is a dict hit instead of a PATH scan;
+    call which.cache_clear() if PATH changes mid-process.
+    """
+    return shutil.which(cmd)
+
+
+@functools.lru_cache(maxsize=8)
+def cli_help(cli_path: str) -> str:
+    """
+    Cached --help output for a resolved CLI path. The capability probe is a
+    property of the binary, not the backend instance, so it runs once per
+    process instead of spawning a subprocess on every backend construction;
+    call cli_help.cache_clear() if the binary changes mid-process.
+    """
+    try:
+        _, out, err = run_subprocess([cli_path, '--help'], timeout=10)
+        return out + err
+    except Exception:
+        return ''
 
 
 def build_cli_command(base_cmd: str, subcommand: str, model: str | None, approval_mode: str | None, extra_args: list[str] | None = None) -> list[str]:
@@ -115,32 +492,36 @@ def build_cli_command(base_cmd: str, subcommand: str, model: str | None, approva
     return parts
 
 
+# First fenced code block, matched in one pass (non-greedy, no backtracking
+# over the whole output) instead of split()-ing every fence into a list.
+_FENCE_RE = re.compile(r"```(.*?)```", re.DOTALL)
+
+
+@functools.lru_cache(maxsize=256)
 def parse_code_and_text(output: str) -> Tuple[str, str]:
     """
     Try to split CLI output into (code, text) using fenced code blocks if present.
+    Memoized: identical outputs (repeat explains, test suites, the interactive
+    loop) skip the fence scan entirely; PyCodex.__init__ clears the cache to
+    bound memory held by long-lived processes.
     """
-    code = ''
-    text = output
-    fence = '```'
-    if fence in output:
-        segments = output.split(fence)
-        if len(segments) >= 3:
-            # Assume the code is in the first fenced block
-            # segments: [pre, (lang)\n code, post ...]
-            code_block = segments[1]
-            # Drop optional language spec on first line
-            if '\n' in code_block:
-                first_line, rest = code_block.split('\n', 1)
-                # If first_line looks like a language tag, use rest; else keep all
-                code = rest if first_line.strip() and not first_line.strip().startswith('#') else code_block
-            else:
-                code = code_block
-            # Text becomes everything else (pre + post)
-            text = (segments[0] + ''.join(segments[2:])).strip()
+    m = _FENCE_RE.search(output)
+    if m is None:
+        return '', output.strip()
+    code_block = m.group(1)
+    # Drop optional language spec on first line
+    if '\n' in code_block:
+        first_line, rest = code_block.split('\n', 1)
+        # If first_line looks like a language tag, use rest; else keep all
+        code = rest if first_line.strip() and not first_line.strip().startswith('#') else code_block
+    else:
+        code = code_block
+    # Text becomes everything around the block
+    text = (output[:m.start()] + output[m.end():]).strip()
     return code.strip(), text.strip()
 
 
-def _load_toml(path: str) -> Dict[str, Any]:
+def _parse_toml(path: str) -> Dict[str, Any]:
     try:
         import tomllib
         with open(path, 'rb') as f:
@@ -158,6 +539,43 @@ def _load_toml(path: str) -> Dict[str, Any]:
         return {}
 
 
+def _load_toml(path: str) -> Dict[str, Any]:
+    """
+    Parse TOML with a pickle sidecar (path + '.pkl') stamped with the source
+    mtime: steady-state startups unpickle the small dict instead of parsing
+    TOML, re-parsing only when the file actually changed. Sidecar problems
+    of any kind just fall back to a fresh parse.
+    """
+    try:
+        src_mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    pkl = path + '.pkl'
+    try:
+        with open(pkl, 'rb') as f:
+            mtime, cfg = pickle.load(f)
+        if mtime == src_mtime and isinstance(cfg, dict):
+            return cfg
+    except Exception:
+        pass
+    cfg = _parse_toml(path)
+    try:
+        with open(pkl, 'wb') as f:
+            pickle.dump((src_mtime, cfg), f, protocol=5)
+    except Exception:
+        pass
+    return cfg
+
+
+# Parsed config keyed by (path -> (st_mtime_ns, dict)); re-parsed only when
+# the file actually changes.
+_CFG_CACHE: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+
+def clear_config_cache() -> None:
+    _CFG_CACHE.clear()
+
+
 def get_config() -> Dict[str, Any]:
     """
     Load config from ~/.pycodex/config.toml if present.
@@ -171,4 +589,13 @@ def get_config() -> Dict[str, Any]:
     """
     home = os.path.expanduser('~')
     path = os.path.join(home, '.pycodex', 'config.toml')
-    return _load_toml(path) or {}
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    hit = _CFG_CACHE.get(path)
+    if hit is not None and hit[0] == mtime:
+        return hit[1]
+    cfg = _load_toml(path) or {}
+    _CFG_CACHE[path] = (mtime, cfg)
+    return cfg